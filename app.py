@@ -2,8 +2,8 @@ import streamlit as st
 import time
 import re
 import json
-import io
-from contextlib import redirect_stdout
+import html
+from collections import OrderedDict
 from dotenv import load_dotenv
 from pydantic import BaseModel
 from langchain_openai import ChatOpenAI
@@ -11,6 +11,8 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
 from langchain.agents import create_tool_calling_agent, AgentExecutor
 from tools import search_tool, wiki_tool, save_tool
+from conversation import ResearchConversation
+from transcript import SessionTranscript
 
 # MUST BE THE FIRST STREAMLIT COMMAND - nothing before this!
 st.set_page_config(
@@ -30,8 +32,8 @@ class ResearchResponse(BaseModel):
     sources: list[str]
     tools_used: list[str]
 
-# Apply CSS for responsive design and proper spacing/justification
-st.markdown("""
+# CSS for responsive design and proper spacing/justification
+PAGE_CSS = """
 <style>
     /* Base styles with proper text justification */
     p, li {
@@ -298,7 +300,18 @@ st.markdown("""
         }
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# Number of past queries whose results are kept for switching back to
+HISTORY_SIZE = 10
+
+@st.cache_data
+def page_css():
+    # Strip comments and whitespace so each full rerun sends as little CSS as possible
+    css = re.sub(r'/\*.*?\*/', '', PAGE_CSS, flags=re.DOTALL)
+    return re.sub(r'\s+', ' ', css).strip()
+
+st.markdown(page_css(), unsafe_allow_html=True)
 
 # Main container for proper spacing and centering
 st.markdown('<div class="container">', unsafe_allow_html=True)
@@ -335,6 +348,8 @@ def initialize_agent():
                 """
                 You are a research assistant that will help generate a research paper.
                 Answer the user query and use neccessary tools. 
+                If the chat history already holds the evidence needed for a follow-up, answer from it
+                and only use tools to look up information that is not covered there.
                 Wrap the output in this format and provide no other text\n{format_instructions}
                 """,
             ),
@@ -352,10 +367,125 @@ def initialize_agent():
         tools=tools
     )
     
-    agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True)
+    agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True, return_intermediate_steps=True)
     
     return agent_executor, parser
 
+def tool_icon(tool):
+    return "🔍" if "search" in tool else "📖" if "wiki" in tool else "💾" if "save" in tool else "🔧"
+
+# Result cards are built as single HTML strings, memoized per ResearchResponse
+@st.cache_data(max_entries=4 * HISTORY_SIZE)
+def result_card_html(response_json):
+    response = ResearchResponse.model_validate_json(response_json)
+    sources = "".join(
+        f'<div class="source-link"><a href="{html.escape(source)}" target="_blank">📚 {html.escape(source)}</a></div>'
+        for source in response.sources
+    )
+    return (
+        f'<div class="research-card"><h2>{html.escape(response.topic)}</h2><p>{html.escape(response.summary)}</p></div>'
+        f'<p class="section-header">Sources</p><div class="sources-container">{sources}</div>'
+    )
+
+@st.cache_data(max_entries=4 * HISTORY_SIZE)
+def methods_html(response_json):
+    response = ResearchResponse.model_validate_json(response_json)
+    tags = "".join(
+        f'<span class="tool-tag">{tool_icon(name)} {html.escape(name)}</span>'
+        for name in (tool.replace("functions.", "") for tool in response.tools_used)
+    )
+    return f'<p class="section-header">Research Methods</p><div class="tool-tags-container">{tags}</div>'
+
+def process_html(thinking_steps):
+    parts = ['<div class="thinking-process"><p class="section-header">How I Researched This Topic</p>']
+    for step in thinking_steps:
+        if step.kind == "thinking":
+            parts.append('<div class="thinking-step"><p style="color: #e2e8f0;">🤔 <strong>Thinking:</strong> Analyzing the request and planning my research approach...</p></div>')
+        
+        elif step.kind == "tool_call":
+            tool_input = html.escape(step.preview) + ("..." if step.truncated else "")
+            parts.append(f'<div class="tool-call"><p style="color: #e2e8f0;">{tool_icon(step.tool)} <strong>Using {html.escape(step.tool)}:</strong> Researching "{tool_input}"</p></div>')
+        
+        elif step.kind == "tool_result":
+            # Only the preview is kept in memory; long results are spilled to disk
+            display_content = html.escape(step.preview)
+            if step.truncated:
+                display_content += "... (truncated)"
+            parts.append(f'<div class="tool-result"><p style="color: #e2e8f0;">📊 <strong>Found information:</strong> {display_content}</p></div>')
+    
+    parts.append('<div class="thinking-step"><p style="color: #e2e8f0;">✅ <strong>Finalizing:</strong> Compiling all information into a comprehensive summary...</p></div></div>')
+    return "".join(parts)
+
+def remember_result(query, structured_response, run_id):
+    # Past queries are kept in least-recently-used order and the oldest ones evicted
+    history = st.session_state.setdefault('history', OrderedDict())
+    history[query] = {
+        "response_json": structured_response.model_dump_json(),
+        "run_id": run_id,
+    }
+    history.move_to_end(query)
+    while len(history) > HISTORY_SIZE:
+        history.popitem(last=False)
+    st.session_state.selected_query = query
+
+@st.fragment
+def save_panel(response_json):
+    # Clicking Save only reruns this fragment
+    if st.button("💾 Save Research Results", use_container_width=True):
+        structured_response = ResearchResponse.model_validate_json(response_json)
+        filename = f"research_{structured_response.topic.replace(' ', '_').lower()}_{time.strftime('%Y%m%d_%H%M%S')}.txt"
+        
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(f"RESEARCH ON: {structured_response.topic}\n\n")
+            f.write(f"SUMMARY:\n{structured_response.summary}\n\n")
+            f.write("SOURCES:\n")
+            for source in structured_response.sources:
+                f.write(f"- {source}\n")
+            f.write("\nRESEARCH METHODS:\n")
+            for tool in structured_response.tools_used:
+                f.write(f"- {tool}\n")
+        
+        st.success(f"Research saved to {filename}")
+
+@st.fragment
+def process_panel(run_id):
+    thinking_steps = st.session_state.transcript.run_steps(run_id)
+    with st.expander("🧠 View Research Process", expanded=False):
+        st.markdown(process_html(thinking_steps), unsafe_allow_html=True)
+        
+        # Load a full payload from disk only when the user picks it
+        spilled = {step.step_id: step for step in thinking_steps if step.spill_key}
+        if spilled:
+            step_id = st.selectbox(
+                "Show full result",
+                [None] + list(spilled),
+                format_func=lambda step_id: "—" if step_id is None else f"{spilled[step_id].preview[:60]}...",
+                key=f"full_result_{run_id}",
+            )
+            if step_id is not None:
+                st.text(st.session_state.transcript.load_full(spilled[step_id]))
+
+@st.fragment
+def results_panel():
+    history = st.session_state.history
+    # Switching between past queries only reruns this fragment
+    if len(history) > 1:
+        if st.session_state.get('selected_query') not in history:
+            st.session_state.selected_query = next(reversed(history))
+        # Newest first by research time; the LRU order below never reorders the options
+        options = sorted(history, key=lambda past_query: history[past_query]["run_id"], reverse=True)
+        st.selectbox("Past research", options, key="selected_query")
+    selected = st.session_state.get('selected_query')
+    if selected not in history:
+        selected = next(reversed(history))
+    history.move_to_end(selected)
+    entry = history[selected]
+    
+    st.markdown(result_card_html(entry["response_json"]), unsafe_allow_html=True)
+    save_panel(entry["response_json"])
+    st.markdown(methods_html(entry["response_json"]), unsafe_allow_html=True)
+    process_panel(entry["run_id"])
+
 # Input container for centered and responsive input
 st.markdown('<div class="input-container">', unsafe_allow_html=True)
 st.markdown('<p class="section-header">What would you like to research?</p>', unsafe_allow_html=True)
@@ -365,205 +495,97 @@ st.markdown('</div>', unsafe_allow_html=True)
 # Button container for proper centering
 st.markdown('<div class="button-container">', unsafe_allow_html=True)
 search_button = st.button("🔍 Start Research", use_container_width=True)
+
+# Earlier turns are passed to the agent so follow-up questions reuse their evidence
+if 'conversation' not in st.session_state:
+    st.session_state.conversation = ResearchConversation()
+if len(st.session_state.conversation) > 0:
+    if st.button("🗑️ Start New Conversation", use_container_width=True):
+        # Reset the shown results and their process steps along with the chat context
+        st.session_state.conversation.clear()
+        st.session_state.pop('history', None)
+        st.session_state.pop('selected_query', None)
+        if 'transcript' in st.session_state:
+            st.session_state.transcript.clear()
+    else:
+        st.caption("Follow-up questions build on the research already done in this conversation.")
 st.markdown('</div>', unsafe_allow_html=True)
 
 # Results section
-if query and (search_button or 'structured_response' in st.session_state):
+if query and search_button:
     try:
-        if search_button or 'structured_response' not in st.session_state:
-            # Initialize progress indicators
-            progress_container = st.container()
-            with progress_container:
-                progress_bar = st.progress(0)
-                status = st.empty()
-            
-            # Show a spinner while processing
-            with st.spinner("Researching..."):
-                status.info("Initializing research agent...")
-                progress_bar.progress(10)
-                
-                # Initialize agent
-                agent_executor, parser = initialize_agent()
-                
-                status.info("Beginning research on: " + query)
-                progress_bar.progress(30)
-                
-                # Capture the agent's verbose output for display
-                agent_output = io.StringIO()
-                
-                # Redirect stdout to capture the verbose output
-                with redirect_stdout(agent_output):
-                    raw_response = agent_executor.invoke({"query": query})
-                
-                # Process the output to get thinking steps
-                output_text = agent_output.getvalue()
-                
-                # Create a function to capture and format the thinking process
-                def process_agent_output(output_text):
-                    # Extract tool calls and results
-                    thinking_steps = []
-                    
-                    # Look for tool invocations
-                    tool_invocations = re.findall(r'Invoking: `([^`]+)` with `([^`]+)`', output_text)
-                    tool_results = re.split(r'Invoking: `[^`]+` with `[^`]+`', output_text)
-                    
-                    if len(tool_results) > 0 and tool_results[0].strip():
-                        thinking_steps.append(("thinking", tool_results[0].strip()))
-                    
-                    # Match invocations with their results
-                    for i, (tool, query) in enumerate(tool_invocations):
-                        thinking_steps.append(("tool_call", (tool, query)))
-                        if i+1 < len(tool_results):
-                            result = tool_results[i+1].strip()
-                            if result:
-                                thinking_steps.append(("tool_result", result))
-                    
-                    return thinking_steps
-                
-                thinking_steps = process_agent_output(output_text)
-                
-                progress_bar.progress(70)
-                status.info("Processing results...")
-                
-                # Parse the response
-                response_text = raw_response.get("output")
-                
-                # The response contains JSON inside a code block
-                if isinstance(response_text, str) and "```json" in response_text:
-                    # Extract JSON from markdown code block
-                    json_match = re.search(r'```json\s*(.*?)\s*```', response_text, re.DOTALL)
-                    if json_match:
-                        json_str = json_match.group(1)
-                        # Parse JSON directly into ResearchResponse
-                        json_data = json.loads(json_str)
-                        structured_response = ResearchResponse(**json_data)
-                    else:
-                        structured_response = parser.parse(response_text)
-                else:
-                    # Try using the regular parser
-                    structured_response = parser.parse(response_text)
-                
-                # Store in session state for persistence
-                st.session_state.structured_response = structured_response
-                st.session_state.thinking_steps = thinking_steps
-                
-                progress_bar.progress(100)
-                status.success("Research complete!")
-                time.sleep(0.5)
-                progress_container.empty()
-        else:
-            # Retrieve from session state if already processed
-            structured_response = st.session_state.structured_response
-            thinking_steps = st.session_state.thinking_steps
-
-        # Responsive row layout
-        st.markdown('<div class="row">', unsafe_allow_html=True)
-        
-        # First column - Research summary
-        st.markdown('<div class="col">', unsafe_allow_html=True)
-        
-        st.markdown(f"""
-        <div class="research-card">
-            <h2>{structured_response.topic}</h2>
-            <p>{structured_response.summary}</p>
-        </div>
-        """, unsafe_allow_html=True)
+        # Initialize progress indicators
+        progress_container = st.container()
+        with progress_container:
+            progress_bar = st.progress(0)
+            status = st.empty()
         
-        # Sources
-        st.markdown('<p class="section-header">Sources</p>', unsafe_allow_html=True)
-        st.markdown('<div class="sources-container">', unsafe_allow_html=True)
-        for source in structured_response.sources:
-            st.markdown(f"""
-            <div class="source-link">
-                <a href="{source}" target="_blank">📚 {source}</a>
-            </div>
-            """, unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-        
-        # Save button
-        if st.button("💾 Save Research Results", use_container_width=True):
-            filename = f"research_{structured_response.topic.replace(' ', '_').lower()}_{time.strftime('%Y%m%d_%H%M%S')}.txt"
+        # Show a spinner while processing
+        with st.spinner("Researching..."):
+            status.info("Initializing research agent...")
+            progress_bar.progress(10)
             
-            with open(filename, "w", encoding="utf-8") as f:
-                f.write(f"RESEARCH ON: {structured_response.topic}\n\n")
-                f.write(f"SUMMARY:\n{structured_response.summary}\n\n")
-                f.write("SOURCES:\n")
-                for source in structured_response.sources:
-                    f.write(f"- {source}\n")
-                f.write("\nRESEARCH METHODS:\n")
-                for tool in structured_response.tools_used:
-                    f.write(f"- {tool}\n")
+            # Initialize agent
+            agent_executor, parser = initialize_agent()
             
-            st.success(f"Research saved to {filename}")
+            status.info("Beginning research on: " + query)
+            progress_bar.progress(30)
             
-        st.markdown('</div>', unsafe_allow_html=True)
-        
-        # Second column - Tools and thinking process
-        st.markdown('<div class="col">', unsafe_allow_html=True)
-        
-        # Research methods/tools
-        st.markdown('<p class="section-header">Research Methods</p>', unsafe_allow_html=True)
-        st.markdown('<div class="tool-tags-container">', unsafe_allow_html=True)
-        for tool in structured_response.tools_used:
-            tool_name = tool.replace("functions.", "")
-            icon = "🔍" if "search" in tool_name else "📖" if "wiki" in tool_name else "💾" if "save" in tool_name else "🔧"
-            st.markdown(f"""
-            <span class="tool-tag">{icon} {tool_name}</span>
-            """, unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-        
-        # Thinking process
-        with st.expander("🧠 View Research Process", expanded=False):
-            st.markdown('<div class="thinking-process">', unsafe_allow_html=True)
-            st.markdown('<p class="section-header">How I Researched This Topic</p>', unsafe_allow_html=True)
+            # Record the agent's steps into the bounded session transcript via a per-invoke callback
+            if 'transcript' not in st.session_state:
+                st.session_state.transcript = SessionTranscript()
+            recorder = st.session_state.transcript.recorder()
             
-            for step_type, content in thinking_steps:
-                if step_type == "thinking":
-                    st.markdown(f"""
-                    <div class="thinking-step">
-                        <p style="color: #e2e8f0;">🤔 <strong>Thinking:</strong> Analyzing the request and planning my research approach...</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                elif step_type == "tool_call":
-                    tool, query = content
-                    icon = "🔍" if "search" in tool else "📖" if "wiki" in tool else "💾" if "save" in tool else "🔧"
-                    st.markdown(f"""
-                    <div class="tool-call">
-                        <p style="color: #e2e8f0;">{icon} <strong>Using {tool}:</strong> Researching "{query}"</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                elif step_type == "tool_result":
-                    # Truncate very long results
-                    if len(content) > 300:
-                        display_content = content[:300] + "... (truncated)"
-                    else:
-                        display_content = content
-                        
-                    st.markdown(f"""
-                    <div class="tool-result">
-                        <p style="color: #e2e8f0;">📊 <strong>Found information:</strong> {display_content}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
+            try:
+                raw_response = agent_executor.invoke(
+                    {
+                        "query": query,
+                        "chat_history": st.session_state.conversation.messages(),
+                    },
+                    config={"callbacks": [recorder]},
+                )
+            finally:
+                recorder.close()
             
-            st.markdown("""
-            <div class="thinking-step">
-                <p style="color: #e2e8f0;">✅ <strong>Finalizing:</strong> Compiling all information into a comprehensive summary...</p>
-            </div>
-            """, unsafe_allow_html=True)
-            st.markdown('</div>', unsafe_allow_html=True)
+            progress_bar.progress(70)
+            status.info("Processing results...")
             
-        st.markdown('</div>', unsafe_allow_html=True)
-        
-        # Close the row
-        st.markdown('</div>', unsafe_allow_html=True)
-        
+            # Parse the response
+            response_text = raw_response.get("output")
+            
+            # The response contains JSON inside a code block
+            if isinstance(response_text, str) and "```json" in response_text:
+                # Extract JSON from markdown code block
+                json_match = re.search(r'```json\s*(.*?)\s*```', response_text, re.DOTALL)
+                if json_match:
+                    json_str = json_match.group(1)
+                    # Parse JSON directly into ResearchResponse
+                    json_data = json.loads(json_str)
+                    structured_response = ResearchResponse(**json_data)
+                else:
+                    structured_response = parser.parse(response_text)
+            else:
+                # Try using the regular parser
+                structured_response = parser.parse(response_text)
+            
+            # Store in the session history for persistence
+            remember_result(query, structured_response, recorder.run_id)
+            st.session_state.conversation.add_turn(
+                query, structured_response, raw_response.get("intermediate_steps", [])
+            )
+            
+            progress_bar.progress(100)
+            status.success("Research complete!")
+            time.sleep(0.5)
+            progress_container.empty()
     except Exception as e:
         st.error(f"An error occurred: {str(e)}")
         if 'raw_response' in locals():
             st.write("Raw response:", raw_response)
 
+if st.session_state.get('history'):
+    results_panel()
+
 # Footer
 st.markdown("""
 <div class="footer">
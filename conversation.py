@@ -0,0 +1,112 @@
+from dataclasses import dataclass, field
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+# Rough token budget for everything passed in as chat_history
+HISTORY_TOKEN_BUDGET = 3000
+# Share of the budget the rolling summary of older turns may use
+SUMMARY_TOKEN_BUDGET = 800
+# Characters of each tool observation kept as reusable evidence
+EVIDENCE_CHARS = 500
+
+
+def estimate_tokens(text: str) -> int:
+    # About four characters per token for English text
+    return len(text) // 4 + 1
+
+
+@dataclass
+class Turn:
+    """A finished research turn together with the tool evidence behind it."""
+    query: str
+    response_json: str
+    topic: str
+    summary: str
+    sources: list[str]
+    evidence: list[str] = field(default_factory=list)
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.query) + estimate_tokens(self.response_json) + sum(
+            estimate_tokens(line) for line in self.evidence
+        )
+
+    def messages(self) -> list:
+        return [HumanMessage(content=self.query), AIMessage(content=self.response_json)]
+
+    def digest(self) -> str:
+        """One line that stands in for the turn once it is compacted."""
+        summary = self.summary.split(". ")[0][:200]
+        line = f"- {self.query} -> {self.topic}: {summary}"
+        if self.sources:
+            line += f" (sources: {', '.join(self.sources)})"
+        return line
+
+
+class ResearchConversation:
+    """Per-session chat history that keeps recent turns and their evidence under a token budget.
+
+    Older turns are compacted into a rolling summary of one line each, so follow-up
+    questions can be answered from what the agent already found.
+    """
+
+    def __init__(self, token_budget: int = HISTORY_TOKEN_BUDGET, summary_budget: int = SUMMARY_TOKEN_BUDGET):
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.turns: list[Turn] = []
+        self.summary_lines: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self.turns) + len(self.summary_lines)
+
+    def add_turn(self, query: str, response, intermediate_steps=()):
+        evidence = []
+        for action, observation in intermediate_steps:
+            observation = str(observation).strip()
+            if len(observation) > EVIDENCE_CHARS:
+                observation = observation[:EVIDENCE_CHARS] + "..."
+            evidence.append(f"- {action.tool}({action.tool_input}): {observation}")
+
+        turn = Turn(
+            query=query,
+            response_json=response.model_dump_json(),
+            topic=response.topic,
+            summary=response.summary,
+            sources=list(response.sources),
+            evidence=evidence,
+        )
+        # The newest turn is never compacted, so its evidence alone must fit beside the summary
+        while turn.evidence and turn.tokens > self.token_budget - self.summary_budget:
+            turn.evidence.pop(0)
+        self.turns.append(turn)
+        self._compact()
+
+    def messages(self) -> list:
+        """Messages for the prompt's chat_history placeholder."""
+        context = []
+        if self.summary_lines:
+            context.append("Summary of earlier research in this conversation:\n" + "\n".join(self.summary_lines))
+        evidence = [line for turn in self.turns for line in turn.evidence]
+        if evidence:
+            context.append("Evidence already gathered in this conversation:\n" + "\n".join(evidence))
+
+        messages = [SystemMessage(content="\n\n".join(context))] if context else []
+        for turn in self.turns:
+            messages.extend(turn.messages())
+        return messages
+
+    def clear(self):
+        self.turns.clear()
+        self.summary_lines.clear()
+
+    def _summary_tokens(self) -> int:
+        return sum(estimate_tokens(line) for line in self.summary_lines)
+
+    def _compact(self):
+        # Fold the oldest turns into the rolling summary until the recent ones fit
+        while len(self.turns) > 1 and (
+            sum(turn.tokens for turn in self.turns) + self._summary_tokens() > self.token_budget
+        ):
+            self.summary_lines.append(self.turns.pop(0).digest())
+        # Drop the oldest summary lines once the summary outgrows its share
+        while len(self.summary_lines) > 1 and self._summary_tokens() > self.summary_budget:
+            self.summary_lines.pop(0)
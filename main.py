@@ -5,6 +5,7 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
 from langchain.agents import create_tool_calling_agent, AgentExecutor
 from tools import search_tool, wiki_tool, save_tool
+from conversation import ResearchConversation
 import sys
 import re
 import json
@@ -33,6 +34,8 @@ try:
                 """
                 You are a research assistant that will help generate a research paper.
                 Answer the user query and use neccessary tools. 
+                If the chat history already holds the evidence needed for a follow-up, answer from it
+                and only use tools to look up information that is not covered there.
                 Wrap the output in this format and provide no other text\n{format_instructions}
                 """,
             ),
@@ -53,37 +56,48 @@ try:
     )
     
     print("Setting up agent executor...")
-    agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True)
+    agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True, return_intermediate_steps=True)
     
     print("Ready to receive query...")
-    query = input("What can i help you research? ")
+    conversation = ResearchConversation()
+    question = "What can i help you research? "
     
-    print("Executing query:", query)
-    raw_response = agent_executor.invoke({"query": query})
-    
-    try:
-        print("Parsing response...")
-        response_text = raw_response.get("output")
-        print("Response type:", type(response_text))
+    while query := input(question):
+        question = "Any follow-up questions? (press Enter to quit) "
+        
+        try:
+            print("Executing query:", query)
+            raw_response = agent_executor.invoke({"query": query, "chat_history": conversation.messages()})
+        except Exception as e:
+            # Report the failed turn but keep the conversation going
+            print(f"Error occurred: {e}", file=sys.stderr)
+            continue
         
-        # The response contains JSON inside a code block
-        if isinstance(response_text, str) and "```json" in response_text:
-            # Extract JSON from markdown code block
-            json_match = re.search(r'```json\s*(.*?)\s*```', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(1)
-                print("Extracted JSON from code block")
-                # Parse JSON directly into ResearchResponse
-                json_data = json.loads(json_str)
-                structured_response = ResearchResponse(**json_data)
+        try:
+            print("Parsing response...")
+            response_text = raw_response.get("output")
+            print("Response type:", type(response_text))
+            
+            # The response contains JSON inside a code block
+            if isinstance(response_text, str) and "```json" in response_text:
+                # Extract JSON from markdown code block
+                json_match = re.search(r'```json\s*(.*?)\s*```', response_text, re.DOTALL)
+                if json_match:
+                    json_str = json_match.group(1)
+                    print("Extracted JSON from code block")
+                    # Parse JSON directly into ResearchResponse
+                    json_data = json.loads(json_str)
+                    structured_response = ResearchResponse(**json_data)
+                else:
+                    structured_response = parser.parse(response_text)
             else:
+                # Try using the regular parser
                 structured_response = parser.parse(response_text)
-        else:
-            # Try using the regular parser
-            structured_response = parser.parse(response_text)
-        
-        print(structured_response)
-    except Exception as e:
-        print("Error parsing response", e, "Raw Response - ", raw_response)
+            
+            print(structured_response)
+            # Keep the turn and its tool evidence so follow-ups can build on it
+            conversation.add_turn(query, structured_response, raw_response.get("intermediate_steps", []))
+        except Exception as e:
+            print("Error parsing response", e, "Raw Response - ", raw_response)
 except Exception as e:
     print(f"Error occurred: {e}", file=sys.stderr)
\ No newline at end of file
@@ -0,0 +1,248 @@
+import os
+import shutil
+import tempfile
+import uuid
+import weakref
+import zlib
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Only this many characters of a step are ever shown inline
+PREVIEW_CHARS = 300
+# Maximum number of step records kept per session
+MAX_STEPS = 200
+# Approximate bytes per session, counting inline previews and spilled payloads.
+# Previews alone stay under about 60 KB, so this is reached before MAX_STEPS
+# once a session has spilled a few long results.
+SESSION_BUDGET_BYTES = 128 * 1024
+# A single step may use at most this share of the session budget
+STEP_BUDGET_SHARE = 4
+
+
+class SpillStore:
+    """Compressed on-disk store for full step payloads."""
+
+    def __init__(self, directory: Optional[str] = None):
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix="research_transcript_")
+            # Remove the spill directory once the owning session is gone
+            self._finalizer = weakref.finalize(self, shutil.rmtree, directory, True)
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        return f"{self.directory}/{key}.z"
+
+    def put(self, compressed: bytes) -> str:
+        key = uuid.uuid4().hex
+        with open(self._path(key), "wb") as f:
+            f.write(compressed)
+        return key
+
+    def load(self, key: str) -> Optional[str]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return zlib.decompress(f.read()).decode("utf-8")
+        except (OSError, zlib.error):
+            return None
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+@dataclass
+class StepRecord:
+    """One entry of the research process, capped to a short preview."""
+    step_id: int
+    run_id: int
+    kind: str  # "thinking", "tool_call" or "tool_result"
+    preview: str
+    size: int = 0  # length of the full payload in characters
+    tool: str = ""
+    spill_key: Optional[str] = None
+    spilled_bytes: int = 0  # compressed size of the payload on disk
+
+    @property
+    def truncated(self) -> bool:
+        return self.size > len(self.preview)
+
+    @property
+    def footprint(self) -> int:
+        return len(self.preview) + len(self.tool) + self.spilled_bytes
+
+
+class _Segment:
+    """Accumulates the text of one step without keeping all of it in memory."""
+
+    def __init__(self, cap: int, spill_cap: int):
+        self.cap = cap
+        self.spill_cap = spill_cap
+        self.head = []
+        self.head_len = 0
+        self.size = 0
+        self.started = False
+        self.compressor = None
+        self.compressed = []
+        self.spilled_chars = 0
+
+    def write(self, text: str):
+        if not self.started:
+            text = text.lstrip()
+            if not text:
+                return
+            self.started = True
+        if self.compressor is None and self.size + len(text) > self.cap:
+            # Until the cap is reached the head holds the whole segment
+            self.compressor = zlib.compressobj()
+            self._spill("".join(self.head))
+        self.size += len(text)
+        if self.head_len < self.cap:
+            part = text[:self.cap - self.head_len]
+            self.head.append(part)
+            self.head_len += len(part)
+        if self.compressor is not None:
+            self._spill(text)
+
+    def _spill(self, text: str):
+        if self.spilled_chars >= self.spill_cap:
+            return
+        if self.spilled_chars + len(text) > self.spill_cap:
+            # Keep the spilled payload within its share of the session budget
+            text = text[:self.spill_cap - self.spilled_chars] + "\n... (truncated)"
+        self.spilled_chars += len(text)
+        self.compressed.append(self.compressor.compress(text.encode("utf-8")))
+
+
+class TranscriptRecorder(BaseCallbackHandler):
+    """Per-invoke callback handler that records the agent's steps as they happen.
+
+    Pass it in the invoke config's callbacks so each session only sees its own
+    run; only a preview of each step is kept in memory and longer payloads are
+    compressed to the spill store.
+    """
+
+    def __init__(self, transcript: "SessionTranscript"):
+        self.transcript = transcript
+        self.run_id = transcript.begin_run()
+        self.closed = False
+
+    def _record(self, kind: str, text: str):
+        # Late callbacks after close() are dropped instead of growing an unrecorded segment
+        if self.closed:
+            return
+        segment = self.transcript.new_segment()
+        segment.write(text)
+        self.transcript.add_segment(self.run_id, kind, segment)
+
+    def on_chain_start(self, serialized, inputs, *, parent_run_id=None, **kwargs):
+        if parent_run_id is None:
+            query = inputs.get("query", "") if isinstance(inputs, dict) else inputs
+            self._record("thinking", f"Researching: {query}")
+
+    def on_agent_action(self, action, **kwargs):
+        if not self.closed:
+            self.transcript.add_tool_call(self.run_id, action.tool, str(action.tool_input))
+
+    def on_tool_end(self, output, **kwargs):
+        self._record("tool_result", str(getattr(output, "content", output)))
+
+    def on_tool_error(self, error, **kwargs):
+        self._record("tool_result", f"Error: {error}")
+
+    def close(self):
+        self.closed = True
+
+
+class SessionTranscript:
+    """Per-session ring buffer of step records with a bounded memory budget."""
+
+    def __init__(self, max_steps: int = MAX_STEPS, budget_bytes: int = SESSION_BUDGET_BYTES,
+                 preview_chars: int = PREVIEW_CHARS, store: Optional[SpillStore] = None):
+        self.max_steps = max_steps
+        self.budget_bytes = budget_bytes
+        self.preview_chars = preview_chars
+        self.store = store or SpillStore()
+        self.steps = deque()
+        self.footprint = 0
+        self._next_step_id = 0
+        self._next_run_id = 0
+
+    def begin_run(self) -> int:
+        self._next_run_id += 1
+        return self._next_run_id
+
+    def recorder(self) -> TranscriptRecorder:
+        return TranscriptRecorder(self)
+
+    @property
+    def step_budget(self) -> int:
+        return self.budget_bytes // STEP_BUDGET_SHARE
+
+    def new_segment(self) -> _Segment:
+        return _Segment(self.preview_chars, self.step_budget)
+
+    def add_tool_call(self, run_id: int, tool: str, tool_input: str):
+        segment = self.new_segment()
+        segment.write(tool_input)
+        self._add(run_id, "tool_call", segment, tool=tool)
+
+    def add_segment(self, run_id: int, kind: str, segment: _Segment):
+        self._add(run_id, kind, segment)
+
+    def _add(self, run_id: int, kind: str, segment: _Segment, tool: str = ""):
+        preview = "".join(segment.head).rstrip()
+        if not preview:
+            return
+        spill_key = None
+        spilled_bytes = 0
+        if segment.compressor is not None:
+            compressed = b"".join(segment.compressed) + segment.compressor.flush()
+            # Multi-byte text can still compress past the step budget; keep only the preview then
+            if len(compressed) + len(preview) + len(tool) <= self.step_budget:
+                spill_key = self.store.put(compressed)
+                spilled_bytes = len(compressed)
+        self._append(StepRecord(
+            step_id=self._step_id(),
+            run_id=run_id,
+            kind=kind,
+            preview=preview,
+            size=segment.size if segment.compressor is not None else len(preview),
+            tool=tool,
+            spill_key=spill_key,
+            spilled_bytes=spilled_bytes,
+        ))
+
+    def load_full(self, step: StepRecord) -> str:
+        """Load the full payload of a step, falling back to its preview once evicted."""
+        if step.spill_key is None:
+            return step.preview
+        full = self.store.load(step.spill_key)
+        return full.strip() if full is not None else step.preview
+
+    def run_steps(self, run_id: int) -> list[StepRecord]:
+        return [step for step in self.steps if step.run_id == run_id]
+
+    def _step_id(self) -> int:
+        self._next_step_id += 1
+        return self._next_step_id
+
+    def _append(self, step: StepRecord):
+        self.steps.append(step)
+        self.footprint += step.footprint
+        # Evict the oldest steps once either the ring size or the budget is exceeded,
+        # but never the step that was just added
+        while len(self.steps) > 1 and (len(self.steps) > self.max_steps or self.footprint > self.budget_bytes):
+            self._evict(self.steps.popleft())
+
+    def _evict(self, step: StepRecord):
+        self.footprint -= step.footprint
+        if step.spill_key is not None:
+            self.store.delete(step.spill_key)
+
+    def clear(self):
+        while self.steps:
+            self._evict(self.steps.popleft())